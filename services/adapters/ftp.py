@@ -4,13 +4,13 @@ import asyncio
 from dataclasses import dataclass
 from typing import List, Dict, Tuple, AsyncIterator, Optional
 
-from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from ftplib import FTP, error_perm
 import mimetypes
 
 from models import StorageAdapter
 from services.logging import LogService
+from .utils import sort_and_paginate_entries, parse_range_header, build_stream_headers
 
 
 def _join_remote(root: str, rel: str) -> str:
@@ -170,26 +170,7 @@ class FTPAdapter:
 
         entries = await asyncio.to_thread(_do_list)
 
-        reverse = sort_order.lower() == "desc"
-
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            f = sort_by.lower()
-            if f == "name":
-                key += (item["name"].lower(),)
-            elif f == "size":
-                key += (item.get("size", 0),)
-            elif f == "mtime":
-                key += (item.get("mtime", 0),)
-            else:
-                key += (item["name"].lower(),)
-            return key
-
-        entries.sort(key=get_sort_key, reverse=reverse)
-        total = len(entries)
-        start = (page_num - 1) * page_size
-        end = start + page_size
-        return entries[start:end], total
+        return sort_and_paginate_entries(entries, page_num, page_size, sort_by, sort_order)
 
     async def read_file(self, root: str, rel: str) -> bytes:
         path = _join_remote(root, rel)
@@ -516,24 +497,14 @@ class FTPAdapter:
 
         rng: Optional[_Range] = None
         status = 200
-        headers = {"Accept-Ranges": "bytes", "Content-Type": content_type}
-        if range_header and range_header.startswith("bytes=") and total_size is not None:
-            try:
-                s, e = (range_header.removeprefix("bytes=").split("-", 1))
-                start = int(s) if s.strip() else 0
-                end = int(e) if e.strip() else (total_size - 1)
-                if start >= total_size:
-                    raise HTTPException(416, detail="Requested Range Not Satisfiable")
-                if end >= total_size:
-                    end = total_size - 1
+        if total_size is not None:
+            start, end, is_partial = parse_range_header(range_header, total_size)
+            headers = build_stream_headers(content_type, total_size, start, end, is_partial)
+            if is_partial:
                 rng = _Range(start, end)
                 status = 206
-                headers["Content-Range"] = f"bytes {start}-{end}/{total_size}"
-                headers["Content-Length"] = str(end - start + 1)
-            except ValueError:
-                raise HTTPException(400, detail="Invalid Range header")
-        elif total_size is not None:
-            headers["Content-Length"] = str(total_size)
+        else:
+            headers = {"Accept-Ranges": "bytes", "Content-Type": content_type}
 
         queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=8)
 
@@ -13,6 +13,7 @@ from fastapi.responses import StreamingResponse
 
 from models import StorageAdapter
 from .base import BaseAdapter
+from .utils import sort_and_paginate_entries, parse_range_header
 
 
 # Quark 普通(UC)接口
@@ -242,27 +243,7 @@ class QuarkAdapter:
         fid = await self._resolve_dir_fid_from(base_fid, rel)
         items = await self._list_children(fid)
 
-        # 排序，目录优先
-        reverse = sort_order.lower() == "desc"
-
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            sf = sort_by.lower()
-            if sf == "name":
-                key += (item["name"].lower(),)
-            elif sf == "size":
-                key += (item["size"],)
-            elif sf == "mtime":
-                key += (item["mtime"],)
-            else:
-                key += (item["name"].lower(),)
-            return key
-
-        items.sort(key=get_sort_key, reverse=reverse)
-        total = len(items)
-        start = (page_num - 1) * page_size
-        end = start + page_size
-        return items[start:end], total
+        return sort_and_paginate_entries(items, page_num, page_size, sort_by, sort_order)
 
     # -----------------
     # 下载与流式下载
@@ -350,24 +331,11 @@ class QuarkAdapter:
         content_type = mime or "application/octet-stream"
 
         # 解析 Range
-        start = 0
-        end: Optional[int] = None
-        status_code = 200
-        if range_header and range_header.startswith("bytes="):
-            status_code = 206
-            part = range_header.split("=", 1)[1]
-            s, e = part.split("-", 1)
-            if s.strip():
-                start = int(s)
-            if e.strip():
-                end = int(e)
-
-        if total_size is not None and end is None and status_code == 206:
-            end = total_size - 1
-        if end is not None and total_size is not None and end >= total_size:
-            end = total_size - 1
-        if total_size is not None and start >= total_size:
-            raise HTTPException(416, detail="Requested Range Not Satisfiable")
+        start, end, is_partial = parse_range_header(range_header, total_size)
+        if start < 0:
+            # 大小未知时无法定位后缀范围，忽略 Range 返回完整内容
+            start, is_partial = 0, False
+        status_code = 206 if is_partial else 200
 
         resp_headers: Dict[str, str] = {"Accept-Ranges": "bytes", "Content-Type": content_type}
         if status_code == 206 and total_size is not None and end is not None:
@@ -3,7 +3,6 @@ import asyncio
 import mimetypes
 from datetime import datetime
 from typing import List, Dict, Tuple, AsyncIterator
-from urllib.parse import quote
 
 import aioboto3
 from botocore.exceptions import ClientError
@@ -11,6 +10,7 @@ from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 from models import StorageAdapter
 from services.logging import LogService
+from .utils import sort_paginate_async, parse_range_header, build_stream_headers
 
 
 class S3Adapter:
@@ -57,60 +57,40 @@ class S3Adapter:
         if prefix and not prefix.endswith("/"):
             prefix += "/"
 
-        all_items = []
-
-        async with self._get_client() as s3:
-            paginator = s3.get_paginator("list_objects_v2")
-            async for result in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter="/"):
-                # 添加子目录
-                for common_prefix in result.get("CommonPrefixes", []):
-                    dir_name = common_prefix.get(
-                        "Prefix").removeprefix(prefix).strip("/")
-                    if dir_name:
-                        all_items.append({
-                            "name": dir_name,
-                            "is_dir": True,
-                            "size": 0,
-                            "mtime": 0,
-                            "type": "dir",
-                        })
-
-                # 添加文件
-                for content in result.get("Contents", []):
-                    file_key = content.get("Key")
-                    if file_key == prefix:  # 忽略目录本身
-                        continue
-                    file_name = file_key.removeprefix(prefix)
-                    if file_name:
-                        all_items.append({
-                            "name": file_name,
-                            "is_dir": False,
-                            "size": content.get("Size", 0),
-                            "mtime": int(content.get("LastModified", datetime.now()).timestamp()),
-                            "type": "file",
-                        })
-
-        # 在内存中排序和分页
-        reverse = sort_order.lower() == "desc"
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            sort_field = sort_by.lower()
-            if sort_field == "name":
-                key += (item["name"].lower(),)
-            elif sort_field == "size":
-                key += (item["size"],)
-            elif sort_field == "mtime":
-                key += (item["mtime"],)
-            else:
-                key += (item["name"].lower(),)
-            return key
-        all_items.sort(key=get_sort_key, reverse=reverse)
-        
-        total_count = len(all_items)
-        start_idx = (page_num - 1) * page_size
-        end_idx = start_idx + page_size
-
-        return all_items[start_idx:end_idx], total_count
+        # 逐页产出条目，排序分页与 S3 的分页请求交错进行
+        async def iter_items():
+            async with self._get_client() as s3:
+                paginator = s3.get_paginator("list_objects_v2")
+                async for result in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter="/"):
+                    # 添加子目录
+                    for common_prefix in result.get("CommonPrefixes", []):
+                        dir_name = common_prefix.get(
+                            "Prefix").removeprefix(prefix).strip("/")
+                        if dir_name:
+                            yield {
+                                "name": dir_name,
+                                "is_dir": True,
+                                "size": 0,
+                                "mtime": 0,
+                                "type": "dir",
+                            }
+
+                    # 添加文件
+                    for content in result.get("Contents", []):
+                        file_key = content.get("Key")
+                        if file_key == prefix:  # 忽略目录本身
+                            continue
+                        file_name = file_key.removeprefix(prefix)
+                        if file_name:
+                            yield {
+                                "name": file_name,
+                                "is_dir": False,
+                                "size": content.get("Size", 0),
+                                "mtime": int(content.get("LastModified", datetime.now()).timestamp()),
+                                "type": "file",
+                            }
+
+        return await sort_paginate_async(iter_items(), page_num, page_size, sort_by, sort_order)
 
     async def read_file(self, root: str, rel: str) -> bytes:
         key = self._get_s3_key(rel)
@@ -318,31 +298,11 @@ class S3Adapter:
                         status_code=404, detail="File not found")
                 raise
 
-            start = 0
-            end = file_size - 1
-            status = 200
-            headers = {
-                "Accept-Ranges": "bytes",
-                "Content-Type": content_type,
-                "Content-Length": str(file_size),
-                "Content-Disposition": f"inline; filename=\"{quote(rel.split('/')[-1])}\""
-            }
-
-            if range_header:
-                range_val = range_header.strip().partition("=")[2]
-                s, _, e = range_val.partition("-")
-                try:
-                    start = int(s) if s else 0
-                    end = int(e) if e else file_size - 1
-                    if start >= file_size or end >= file_size or start > end:
-                        raise HTTPException(
-                            status_code=416, detail="Requested Range Not Satisfiable")
-                    status = 206
-                    headers["Content-Length"] = str(end - start + 1)
-                    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
-                except ValueError:
-                    raise HTTPException(
-                        status_code=400, detail="Invalid Range header")
+            start, end, is_partial = parse_range_header(range_header, file_size)
+            status = 206 if is_partial else 200
+            headers = build_stream_headers(
+                content_type, file_size, start, end, is_partial, rel.split('/')[-1]
+            )
 
             range_arg = f"bytes={start}-{end}"
 
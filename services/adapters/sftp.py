@@ -11,6 +11,7 @@ import paramiko
 
 from models import StorageAdapter
 from services.logging import LogService
+from .utils import sort_and_paginate_entries, parse_range_header, build_stream_headers
 
 
 def _join_remote(root: str, rel: str) -> str:
@@ -88,26 +89,7 @@ class SFTPAdapter:
 
         entries = await asyncio.to_thread(_do_list)
 
-        reverse = sort_order.lower() == "desc"
-
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            f = sort_by.lower()
-            if f == "name":
-                key += (item["name"].lower(),)
-            elif f == "size":
-                key += (item.get("size", 0),)
-            elif f == "mtime":
-                key += (item.get("mtime", 0),)
-            else:
-                key += (item["name"].lower(),)
-            return key
-
-        entries.sort(key=get_sort_key, reverse=reverse)
-        total = len(entries)
-        start = (page_num - 1) * page_size
-        end = start + page_size
-        return entries[start:end], total
+        return sort_and_paginate_entries(entries, page_num, page_size, sort_by, sort_order)
 
     async def read_file(self, root: str, rel: str) -> bytes:
         path = _join_remote(root, rel)
@@ -358,31 +340,9 @@ class SFTPAdapter:
         mime, _ = mimetypes.guess_type(rel)
         content_type = mime or "application/octet-stream"
 
-        start = 0
-        end = file_size - 1
-        status = 200
-        headers = {
-            "Accept-Ranges": "bytes",
-            "Content-Type": content_type,
-            "Content-Length": str(file_size),
-        }
-
-        if range_header and range_header.startswith("bytes="):
-            try:
-                s, e = (range_header.removeprefix("bytes=").split("-", 1))
-                if s.strip():
-                    start = int(s)
-                if e.strip():
-                    end = int(e)
-                if start >= file_size:
-                    raise HTTPException(416, detail="Requested Range Not Satisfiable")
-                if end >= file_size:
-                    end = file_size - 1
-                status = 206
-                headers["Content-Length"] = str(end - start + 1)
-                headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
-            except ValueError:
-                raise HTTPException(400, detail="Invalid Range header")
+        start, end, is_partial = parse_range_header(range_header, file_size)
+        status = 206 if is_partial else 200
+        headers = build_stream_headers(content_type, file_size, start, end, is_partial)
 
         queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=8)
 
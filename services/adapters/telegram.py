@@ -3,6 +3,7 @@ from typing import List, Dict, Tuple, AsyncIterator
 import io
 import os
 from models import StorageAdapter
+from .utils import sort_and_paginate_entries, parse_range_header, build_stream_headers
 from telethon import TelegramClient
 from telethon.sessions import StringSession
 import socks
@@ -112,30 +113,7 @@ class TelegramAdapter:
             if client.is_connected():
                 await client.disconnect()
 
-        # 排序
-        reverse = sort_order.lower() == "desc"
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            sort_field = sort_by.lower()
-            if sort_field == "name":
-                key += (item["name"].lower(),)
-            elif sort_field == "size":
-                key += (item["size"],)
-            elif sort_field == "mtime":
-                key += (item["mtime"],)
-            else:
-                key += (item["name"].lower(),)
-            return key
-        entries.sort(key=get_sort_key, reverse=reverse)
-        
-        total_count = len(entries)
-        
-        # 分页
-        start_idx = (page_num - 1) * page_size
-        end_idx = start_idx + page_size
-        page_entries = entries[start_idx:end_idx]
-        
-        return page_entries, total_count
+        return sort_and_paginate_entries(entries, page_num, page_size, sort_by, sort_order)
 
     async def read_file(self, root: str, rel: str) -> bytes:
         try:
@@ -267,29 +245,10 @@ class TelegramAdapter:
                 else:
                     mime_type = "application/octet-stream"
 
-            start = 0
-            end = file_size - 1
-            status = 200
-            
-            headers = {
-                "Accept-Ranges": "bytes",
-                "Content-Type": mime_type,
-                "Content-Length": str(file_size),
-            }
+            start, end, is_partial = parse_range_header(range_header, file_size)
+            status = 206 if is_partial else 200
 
-            if range_header:
-                try:
-                    range_val = range_header.strip().partition("=")[2]
-                    s, _, e = range_val.partition("-")
-                    start = int(s) if s else 0
-                    end = int(e) if e else file_size - 1
-                    if start >= file_size or end >= file_size or start > end:
-                        raise HTTPException(status_code=416, detail="Requested Range Not Satisfiable")
-                    status = 206
-                    headers["Content-Length"] = str(end - start + 1)
-                    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
-                except ValueError:
-                    raise HTTPException(status_code=400, detail="Invalid Range header")
+            headers = build_stream_headers(mime_type, file_size, start, end, is_partial)
 
             async def iterator():
                 try:
@@ -0,0 +1,420 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import operator
+import io
+import os
+import re
+import struct
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Mapping, Set, Tuple
+from urllib.parse import quote
+
+import aiofiles
+from fastapi import HTTPException
+
+__all__ = [
+    "sort_and_paginate_entries",
+    "sort_paginate_async",
+    "extract_exif_data",
+    "extract_exif_batch",
+    "parse_range_header",
+    "build_stream_headers",
+    "check_file_exists",
+    "extract_raw_thumbnail",
+]
+
+EXIF_IFD_POINTER = 0x8769
+EXIF_HEADER_READ_SIZE = 64 * 1024
+NUMPY_SORT_THRESHOLD = 2048
+STREAM_SORT_BATCH = 256
+# 排序缓存累计持有的键数上限，以及单个目录可进入缓存的最大条目数
+SORT_CACHE_MAX_KEYS = 200_000
+SORT_CACHE_MAX_ENTRY_KEYS = 50_000
+
+# EXIF 解析共用的有界线程池，避免目录级批量扫描时无限并发打开图片
+_EXIF_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="exif")
+
+_SORT_CACHE: "OrderedDict[Tuple[Tuple[Tuple, ...], bool], Tuple[int, ...]]" = OrderedDict()
+_sort_cache_keys = 0
+
+_RANGE_RE = re.compile(r"bytes=\s*(\d*)\s*-\s*(\d*)\s*")
+_match_range = _RANGE_RE.fullmatch
+
+
+def _build_sort_keys(entries: List[Dict], sort_by: str) -> List[Tuple]:
+    """为每个条目计算一次排序键 (是否文件, 字段值)，目录优先；名称只小写一次。"""
+    sort_field = (sort_by or "name").lower()
+    if sort_field == "size":
+        return [(not item["is_dir"], item.get("size", 0)) for item in entries]
+    if sort_field == "mtime":
+        return [(not item["is_dir"], item.get("mtime", 0)) for item in entries]
+    return [(not item["is_dir"], item["name"].lower()) for item in entries]
+
+
+def _is_sorted(keys: List[Tuple], reverse: bool) -> bool:
+    cmp = operator.ge if reverse else operator.le
+    return all(map(cmp, keys, islice(keys, 1, None)))
+
+
+def _sort_indices_np(keys: Tuple[Tuple, ...], reverse: bool) -> List[int]:
+    """用 numpy.lexsort 在 C 层完成数值键排序，次序与 sorted() 一致（含稳定性）。"""
+    import numpy as np
+    n = len(keys)
+    if reverse:
+        # 倒序输入做稳定升序再整体反转，相等元素保持原始先后
+        keys = keys[::-1]
+    files_first = np.fromiter((k[0] for k in keys), dtype=bool, count=n)
+    # 由 numpy 推断类型：按 int64 强转会截断浮点值，导致与 sorted() 次序不同
+    primary = np.array([k[1] for k in keys])
+    if primary.dtype.kind not in "iuf":
+        raise TypeError(f"unsupported sort key dtype {primary.dtype}")
+    order = np.lexsort((primary, files_first))
+    if reverse:
+        order = (n - 1) - order[::-1]
+    return order.tolist()
+
+
+def _compute_order(keys: Tuple[Tuple, ...], reverse: bool) -> Tuple[int, ...]:
+    # 名称键不走 numpy：定长 unicode 数组按最长名称分配每一行，且会丢弃结尾的 \x00
+    if len(keys) >= NUMPY_SORT_THRESHOLD and not isinstance(keys[0][1], str):
+        try:
+            return tuple(_sort_indices_np(keys, reverse))
+        except ImportError:
+            pass  # 未安装 numpy 时回退到 sorted()
+        except (TypeError, ValueError, OverflowError):
+            pass  # 字段类型不统一（如 size 为 None）时回退到 sorted()
+    return tuple(sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse))
+
+
+def _sorted_order(keys: List[Tuple], reverse: bool) -> Tuple[int, ...]:
+    """按排序键返回条目下标顺序。
+
+    缓存服务于后半段翻页与整表排序（如挂载合并）；靠前的页走 heapq 分支。
+    缓存按累计键数而非条目数限额，超大目录不缓存，避免长期持有大量名称。
+    """
+    global _sort_cache_keys
+    n = len(keys)
+    if n > SORT_CACHE_MAX_ENTRY_KEYS:
+        return _compute_order(keys, reverse)
+    cache_key = (tuple(keys), reverse)
+    order = _SORT_CACHE.get(cache_key)
+    if order is not None:
+        _SORT_CACHE.move_to_end(cache_key)
+        return order
+    order = _compute_order(cache_key[0], reverse)
+    _SORT_CACHE[cache_key] = order
+    _sort_cache_keys += n
+    while _sort_cache_keys > SORT_CACHE_MAX_KEYS:
+        (old_keys, _), _ = _SORT_CACHE.popitem(last=False)
+        _sort_cache_keys -= len(old_keys)
+    return order
+
+
+def sort_and_paginate_entries(
+    entries: List[Dict],
+    page_num: int = 1,
+    page_size: int = 50,
+    sort_by: str = "name",
+    sort_order: str = "asc",
+) -> Tuple[List[Dict], int]:
+    """对目录条目排序并分页，返回 (当前页条目, 总数)。"""
+    reverse = sort_order.lower() == "desc"
+
+    total_count = len(entries)
+    start_idx = (page_num - 1) * page_size
+    end_idx = start_idx + page_size
+    if start_idx >= total_count:
+        return [], total_count
+
+    # 每个条目只计算一次排序键，比较过程只处理元组
+    keys = _build_sort_keys(entries, sort_by)
+    if _is_sorted(keys, reverse):
+        # 多数存储按名称返回列表，已有序时跳过排序；检查在首个逆序处即终止
+        return entries[start_idx:end_idx], total_count
+    if end_idx < total_count // 2:
+        # 只需要前 end_idx 个时使用部分排序，结果与完整排序后切片一致
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        order = pick(end_idx, range(total_count), key=keys.__getitem__)
+    else:
+        # 排序结果只取决于键序列，以其作为指纹缓存，后半段翻页时无需重复排序
+        order = _sorted_order(keys, reverse)
+    # 页面仍以 list 返回：调用方会求 len、多次遍历并与挂载条目拼接
+    return list(map(entries.__getitem__, order[start_idx:end_idx])), total_count
+
+
+async def sort_paginate_async(
+    entries: AsyncIterator[Dict],
+    page_num: int = 1,
+    page_size: int = 50,
+    sort_by: str = "name",
+    sort_order: str = "asc",
+) -> Tuple[List[Dict], int]:
+    """sort_and_paginate_entries 的流式版本，适用于分批返回的云存储列表。
+
+    边接收边只保留排序靠前的 end_idx 个条目，内存占用取决于页码而非目录大小，
+    排序计算与上游网络请求交错进行。结果与 sort_and_paginate_entries 一致。
+    """
+    reverse = sort_order.lower() == "desc"
+    start_idx = (page_num - 1) * page_size
+    end_idx = start_idx + page_size
+    pick = heapq.nlargest if reverse else heapq.nsmallest
+    by_key = operator.itemgetter(0)
+    batch_size = max(end_idx, STREAM_SORT_BATCH)
+
+    total_count = 0
+    pending: List[Dict] = []
+    kept: List[Tuple] = []
+
+    def flush():
+        nonlocal kept
+        kept.extend(zip(_build_sort_keys(pending, sort_by), pending))
+        pending.clear()
+        if len(kept) >= 2 * end_idx:
+            # 裁剪后 kept 按键排序而非到达顺序，但结果仍稳定：heapq 的选取对相等键保留
+            # 其在 kept 中的先后（即到达顺序），而后续批次总是追加在 kept 之后，
+            # 因此相等键始终按到达顺序排列，与完整排序后切片一致
+            kept = pick(end_idx, kept, key=by_key)
+
+    async for item in entries:
+        total_count += 1
+        if end_idx <= 0:
+            continue
+        pending.append(item)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+    if start_idx >= total_count:
+        return [], total_count
+    top = pick(end_idx, kept, key=by_key)
+    return [item for _, item in top[start_idx:end_idx]], total_count
+
+
+@lru_cache(maxsize=None)
+def _known_exif_tags() -> frozenset[int]:
+    """ExifTags.TAGS 中的标准标签，去掉仅为子 IFD 偏移量的指针标签。"""
+    from PIL.ExifTags import IFD, TAGS
+    return frozenset(TAGS) - {int(member) for member in IFD}
+
+
+def _merge_exif_ifds(exif) -> Dict[int, Any]:
+    """合并 IFD0 与 Exif 子 IFD 标签（曝光、光圈、ISO 等位于子 IFD 中）。"""
+    merged = dict(exif)
+    merged.update(exif.get_ifd(EXIF_IFD_POINTER))
+    return merged
+
+
+def _read_exif(img) -> Mapping[int, Any]:
+    getexif = getattr(img, "getexif", None)
+    if callable(getexif):
+        return _merge_exif_ifds(getexif())
+    legacy = getattr(img, "_getexif", None)
+    return (legacy() if callable(legacy) else None) or {}
+
+
+def _find_jpeg_exif(header: bytes) -> bytes | None:
+    """在 JPEG 头部扫描 APP1 段，返回其中的 TIFF 格式 EXIF 数据。"""
+    if not header.startswith(b"\xff\xd8"):
+        return None
+    pos, size = 2, len(header)
+    while pos + 4 <= size:
+        if header[pos] != 0xFF:
+            return None
+        marker = header[pos + 1]
+        if marker in (0xD9, 0xDA):  # EOI / SOS 之后不会再有 EXIF
+            return None
+        end = pos + 2 + int.from_bytes(header[pos + 2:pos + 4], "big")
+        if marker == 0xE1 and header[pos + 4:pos + 10] == b"Exif\x00\x00":
+            return header[pos + 10:end] if end <= size else None
+        pos = end
+    return None
+
+
+def _extract_exif_sync(source: Path | str | bytes, header: bytes, tags: Set[int] | None) -> Dict[str, str] | None:
+    from PIL import Image
+    exif_data = None
+    tiff = _find_jpeg_exif(header)
+    if tiff:
+        try:
+            exif = Image.Exif()
+            exif.load(tiff)
+            exif_data = _merge_exif_ifds(exif)
+        except (OSError, SyntaxError, ValueError, struct.error):
+            # 截断或损坏的 TIFF 头，交给下面的完整解析
+            exif_data = None
+    if exif_data is None:
+        # 非 JPEG 或头部解析失败时回退到 PIL 打开完整文件
+        try:
+            fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+            with Image.open(fp) as img:
+                exif_data = _read_exif(img)
+        except (OSError, SyntaxError, ValueError, struct.error, Image.DecompressionBombError):
+            # UnidentifiedImageError 属于 OSError
+            return None
+    if not exif_data:
+        return None
+    # MakerNote、UserComment 等二进制标签的 repr 动辄数 KB，前端也用不到，直接跳过；
+    # 同时只保留 EXIF 标准中已知的标签
+    known = _known_exif_tags()
+    allowed = known if tags is None else known.intersection(tags)
+    _str = str
+    return {
+        _str(k): _str(v)
+        for k, v in exif_data.items()
+        if k in allowed and not isinstance(v, (bytes, bytearray))
+    }
+
+
+def _extract_exif_from_path_sync(path: Path | str, tags: Set[int] | None) -> Dict[str, str] | None:
+    try:
+        with open(path, "rb") as f:
+            header = f.read(EXIF_HEADER_READ_SIZE)
+    except OSError:
+        return None
+    return _extract_exif_sync(path, header, tags)
+
+
+async def extract_exif_data(source: Path | str | bytes, tags: Set[int] | None = None) -> Dict[str, str] | None:
+    """提取图片 EXIF，键为标签 ID 字符串；指定 tags 时只转换这些标签。"""
+    if isinstance(source, (bytes, bytearray)):
+        header = source
+    else:
+        try:
+            async with aiofiles.open(source, "rb") as f:
+                header = await f.read(EXIF_HEADER_READ_SIZE)
+        except OSError:
+            return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXIF_POOL, _extract_exif_sync, source, header, tags)
+
+
+async def extract_exif_batch(paths: List[Path | str], tags: Set[int] | None = None) -> List[Dict[str, str] | None]:
+    """批量提取本地文件 EXIF，结果顺序与 paths 一致；读头与解析都在共享线程池内完成。"""
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(_EXIF_POOL, _extract_exif_from_path_sync, p, tags) for p in paths]
+    return await asyncio.gather(*futures)
+
+
+def parse_range_header(range_header: str | None, file_size: int | None) -> Tuple[int, int | None, bool]:
+    """解析单段 Range 头，返回 (start, end, 是否部分内容)。
+
+    file_size 已知时校验越界并把 end 截断到文件末尾；未知时（上游尚未探测大小）
+    只做语法解析，缺省的 end 返回 None，后缀范围 bytes=-N 返回 start=-N，
+    由调用方在得知大小后再次解析。
+    """
+    last = file_size - 1 if file_size is not None else None
+    if not range_header:
+        return 0, last, False
+    if range_header.endswith("-") and range_header[6:-1].isdecimal() and range_header.startswith("bytes="):
+        # 浏览器播放音视频时几乎总是发送 "bytes=N-"，不经正则直接解析
+        start, end = int(range_header[6:-1]), last
+    else:
+        m = _match_range(range_header)
+        if m is None:
+            if range_header.startswith("bytes="):
+                raise HTTPException(400, detail="Invalid Range header")
+            return 0, last, False
+        s, e = m.groups()
+        if not s and e:
+            # 后缀范围 bytes=-N 表示最后 N 个字节
+            suffix = int(e)
+            if suffix == 0:
+                raise HTTPException(416, detail="Requested Range Not Satisfiable")
+            if file_size is None:
+                return -suffix, None, True
+            start, end = max(0, file_size - suffix), last
+        else:
+            start = int(s) if s else 0
+            end = int(e) if e else last
+    if file_size is None:
+        return start, end, True
+    if start >= file_size or start > end:
+        raise HTTPException(416, detail="Requested Range Not Satisfiable")
+    if end >= file_size:
+        end = file_size - 1
+    return start, end, True
+
+
+@lru_cache(maxsize=1024)
+def _quote_filename(name: str) -> str:
+    return quote(name)
+
+
+def build_stream_headers(
+    content_type: str,
+    file_size: int,
+    start: int,
+    end: int,
+    is_partial: bool,
+    filename: str | None = None,
+) -> Dict[str, str]:
+    """构造文件流响应头；is_partial 时附带 Content-Range。"""
+    # 按形状一次写出字典字面量，省去逐键插入
+    if is_partial:
+        # 纯整数模板用 %d 略快于 f-string；文件名仍用 f-string（字符串插值时后者更快）
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Type": content_type,
+            "Content-Range": "bytes %d-%d/%d" % (start, end, file_size),
+            "Content-Length": str(end - start + 1),
+        }
+    else:
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Type": content_type,
+            "Content-Length": str(file_size),
+        }
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{_quote_filename(filename)}"'
+    return headers
+
+
+_EXISTS_CACHE: "weakref.WeakKeyDictionary[type, Any]" = weakref.WeakKeyDictionary()
+
+
+async def check_file_exists(adapter_instance: Any, root: str, rel: str, overwrite: bool) -> None:
+    """不允许覆盖且目标已存在时抛出 409；适配器未实现 exists 时跳过检查。"""
+    if overwrite:
+        return
+    cls = type(adapter_instance)
+    exists_func = _EXISTS_CACHE.get(cls)
+    if exists_func is None:
+        exists_func = getattr(cls, "exists", None)
+        if not callable(exists_func):
+            exists_func = False
+        _EXISTS_CACHE[cls] = exists_func
+    if exists_func and await exists_func(adapter_instance, root, rel):
+        raise HTTPException(409, detail="Destination exists")
+
+
+def extract_raw_thumbnail(source: Path | bytes, half_size: bool = False):
+    """提取 RAW 预览图：内嵌 JPEG 直接返回其 bytes，其余情况返回 PIL Image。
+
+    传入 Path 时由 libraw 按路径读取，避免把整个 RAW 文件读入内存。
+    无内嵌预览时需要解马赛克；half_size 仅适合缩略图，全尺寸查看应保持 False。
+    """
+    import rawpy
+    from PIL import Image
+    if isinstance(source, Path):
+        raw_ctx = rawpy.imread(str(source))
+    else:
+        raw_ctx = rawpy.imread(io.BytesIO(source))
+    with raw_ctx as raw:
+        try:
+            thumb = raw.extract_thumb()
+        except rawpy.LibRawNoThumbnailError:
+            thumb = None
+        if thumb is not None:
+            if thumb.format == rawpy.ThumbFormat.JPEG:
+                return thumb.data
+            if thumb.format == rawpy.ThumbFormat.BITMAP:
+                return Image.fromarray(thumb.data)
+        # 半尺寸解马赛克速度约为全尺寸的 4 倍，但像素只有四分之一
+        rgb = raw.postprocess(use_camera_wb=True, half_size=half_size, output_bps=8)
+        return Image.fromarray(rgb)
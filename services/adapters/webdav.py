@@ -5,6 +5,7 @@ from urllib.parse import urljoin, quote
 from urllib.parse import urlparse, unquote
 import xml.etree.ElementTree as ET
 from models import StorageAdapter
+from .utils import sort_and_paginate_entries, extract_exif_data, parse_range_header
 import mimetypes
 import logging
 from fastapi import HTTPException
@@ -109,30 +110,7 @@ class WebDAVAdapter:
                 "type": "dir" if is_dir else "file",
             })
 
-        # 排序所有条目
-        reverse = sort_order.lower() == "desc"
-        def get_sort_key(item):
-            key = (not item["is_dir"],)
-            sort_field = sort_by.lower()
-            if sort_field == "name":
-                key += (item["name"].lower(),)
-            elif sort_field == "size":
-                key += (item["size"],)
-            elif sort_field == "mtime":
-                key += (item["mtime"],)
-            else:
-                key += (item["name"].lower(),)
-            return key
-        all_entries.sort(key=get_sort_key, reverse=reverse)
-        
-        total_count = len(all_entries)
-
-        # 应用分页
-        start_idx = (page_num - 1) * page_size
-        end_idx = start_idx + page_size
-        page_entries = all_entries[start_idx:end_idx]
-
-        return page_entries, total_count
+        return sort_and_paginate_entries(all_entries, page_num, page_size, sort_by, sort_order)
 
     async def read_file(self, root: str, rel: str) -> bytes:
         url = self._build_url(rel)
@@ -278,17 +256,7 @@ class WebDAVAdapter:
         timeout = self.timeout
         auth = (self.username, self.password) if self.username else None
 
-        client_start = 0
-        client_end = None
-        status_code = 200
-        if range_header and range_header.startswith("bytes="):
-            status_code = 206
-            part = range_header.removeprefix("bytes=")
-            s, e = part.split("-", 1)
-            if s.strip():
-                client_start = int(s)
-            if e.strip():
-                client_end = int(e)
+        client_start, client_end, is_partial = parse_range_header(range_header, None)
 
         total_size = None
         accept_ranges = False
@@ -322,10 +290,13 @@ class WebDAVAdapter:
                 except Exception as e:
                     logger.debug("Probe 0-0 failed %s err=%s", url, e)
 
-        if total_size is not None and client_end is None:
-            client_end = total_size - 1
-        if client_end is not None and client_end < client_start:
-            raise HTTPException(416, detail="Requested Range Not Satisfiable")
+        if total_size is not None:
+            # 得知大小后重新解析：后缀范围与越界校验都依赖文件大小
+            client_start, client_end, is_partial = parse_range_header(range_header, total_size)
+        elif client_start < 0:
+            # 大小未知时无法定位后缀范围，忽略 Range 返回完整内容
+            client_start, is_partial = 0, False
+        status_code = 206 if is_partial else 200
 
         # 若客户端未请求范围且上游不支持 Range，直接透传
         if status_code == 200 and (range_header is None) and not accept_ranges:
@@ -473,12 +444,7 @@ class WebDAVAdapter:
                     try:
                         resp_img = await client.get(url)
                         if resp_img.status_code == 200:
-                            from PIL import Image
-                            from io import BytesIO
-                            img = Image.open(BytesIO(resp_img.content))
-                            exif_data = img._getexif()
-                            if exif_data:
-                                exif = {str(k): str(v) for k, v in exif_data.items()}
+                            exif = await extract_exif_data(resp_img.content)
                     except Exception:
                         exif = None
             info["exif"] = exif
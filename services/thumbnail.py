@@ -8,6 +8,7 @@ from contextlib import suppress
 from pathlib import Path
 from typing import Tuple
 from fastapi import HTTPException
+from services.adapters.utils import extract_raw_thumbnail
 
 ALLOWED_EXT = {"jpg", "jpeg", "png", "webp", "gif", "bmp",
                "tiff", "arw", "cr2", "cr3", "nef", "rw2", "orf", "pef", "dng"}
@@ -78,29 +79,17 @@ def _image_to_webp(im, w: int, h: int, fit: str) -> Tuple[bytes, str]:
     return buf.getvalue(), 'image/webp'
 
 
-def generate_thumb(data: bytes, w: int, h: int, fit: str, is_raw: bool = False) -> Tuple[bytes, str]:
+def generate_thumb(data: bytes | Path, w: int, h: int, fit: str, is_raw: bool = False) -> Tuple[bytes, str]:
     from PIL import Image
     if is_raw:
         try:
-            import rawpy
-            with rawpy.imread(io.BytesIO(data)) as raw:
-                try:
-                    thumb = raw.extract_thumb()
-                except rawpy.LibRawNoThumbnailError:
-                    thumb = None
-
-                if thumb is not None and thumb.format in [rawpy.ThumbFormat.JPEG, rawpy.ThumbFormat.BITMAP]:
-                    im = Image.open(io.BytesIO(thumb.data))
-                else:
-                    rgb = raw.postprocess(
-                        use_camera_wb=False, use_auto_wb=True, output_bps=8)
-                    im = Image.fromarray(rgb)
+            preview = extract_raw_thumbnail(data, half_size=True)
         except Exception as e:
             print(f"rawpy processing failed: {e}")
             raise e
-
+        im = Image.open(io.BytesIO(preview)) if isinstance(preview, bytes) else preview
     else:
-        im = Image.open(io.BytesIO(data))
+        im = Image.open(data if isinstance(data, Path) else io.BytesIO(data))
 
     return _image_to_webp(im, w, h, fit)
 
@@ -313,7 +302,11 @@ async def get_or_create_thumb(adapter, adapter_id: int, root: str, rel: str, w:
                 raise HTTPException(
                     500, detail=f"Video thumbnail generation failed: {e}")
         else:
-            read_data = await adapter.read_file(root, rel)
+            local_path_impl = getattr(adapter, "get_local_path", None)
+            if callable(local_path_impl):
+                read_data = local_path_impl(root, rel)
+            else:
+                read_data = await adapter.read_file(root, rel)
             try:
                 thumb_bytes, mime = generate_thumb(
                     read_data, w, h, fit, is_raw=is_raw_filename(rel))
@@ -14,6 +14,7 @@ import aiofiles
 
 from models import StorageAdapter
 from .adapters.registry import runtime_registry
+from .adapters.utils import sort_and_paginate_entries, check_file_exists, extract_raw_thumbnail
 from api.response import page
 from .thumbnail import is_image_filename, is_raw_filename, is_video_filename
 from services.processors.registry import get as get_processor
@@ -154,21 +155,6 @@ async def list_virtual_dir(path: str, page_num: int = 1, page_size: int = 50, so
                 child_mount_entries.append(tail)
     child_mount_entries = sorted(set(child_mount_entries))
 
-    sort_field = sort_by.lower()
-    reverse = sort_order.lower() == "desc"
-
-    def build_sort_key(item: Dict) -> Tuple:
-        key = (not bool(item.get("is_dir")),)
-        if sort_field == "name":
-            key += (str(item.get("name", "")).lower(),)
-        elif sort_field == "size":
-            key += (int(item.get("size", 0)),)
-        elif sort_field == "mtime":
-            key += (int(item.get("mtime", 0)),)
-        else:
-            key += (str(item.get("name", "")).lower(),)
-        return key
-
     def annotate_entry(entry: Dict) -> None:
         if not entry.get("is_dir"):
             name = entry.get("name", "")
@@ -234,12 +220,9 @@ async def list_virtual_dir(path: str, page_num: int = 1, page_size: int = 50, so
         combined_entries = adapter_entries_for_merge + [
             {**ent, "has_thumbnail": False} for ent in mount_entries
         ]
-        combined_entries.sort(key=build_sort_key, reverse=reverse)
-
-        total_entries = len(combined_entries)
-        start_idx = (page_num - 1) * page_size
-        end_idx = start_idx + page_size
-        page_entries = combined_entries[start_idx:end_idx]
+        page_entries, total_entries = sort_and_paginate_entries(
+            combined_entries, page_num, page_size, sort_by, sort_order
+        )
         return page(page_entries, total_entries, page_num, page_size)
 
     annotate_entry_list = adapter_entries_page or []
@@ -272,15 +255,7 @@ async def write_file_stream(path: str, data_iter: AsyncIterator[bytes], overwrit
     adapter_instance, _, root, rel = await resolve_adapter_and_rel(path)
     if rel.endswith('/'):
         raise HTTPException(400, detail="Invalid file path")
-    exists_func = getattr(adapter_instance, "exists", None)
-    if not overwrite and callable(exists_func):
-        try:
-            if await exists_func(root, rel):
-                raise HTTPException(409, detail="Destination exists")
-        except HTTPException:
-            raise
-        except Exception:
-            pass
+    await check_file_exists(adapter_instance, root, rel, overwrite)
 
     size = 0
     stream_func = getattr(adapter_instance, "write_file_stream", None)
@@ -495,31 +470,25 @@ async def stream_file(path: str, range_header: str | None):
     if not rel or rel.endswith('/'):
         raise HTTPException(400, detail="Path is a directory")
     if is_raw_filename(rel):
-        import rawpy
-        from PIL import Image
         import io
         try:
-            raw_data = await read_file(path)
+            local_path_impl = getattr(adapter_instance, "get_local_path", None)
+            if callable(local_path_impl):
+                source = local_path_impl(root, rel)
+            else:
+                source = await read_file(path)
             try:
-                import rawpy
-                with rawpy.imread(io.BytesIO(raw_data)) as raw:
-                    try:
-                        thumb = raw.extract_thumb()
-                    except rawpy.LibRawNoThumbnailError:
-                        thumb = None
-                    
-                    if thumb is not None and thumb.format in [rawpy.ThumbFormat.JPEG, rawpy.ThumbFormat.BITMAP]:
-                        im = Image.open(io.BytesIO(thumb.data))
-                    else:
-                        rgb = raw.postprocess(use_camera_wb=False, use_auto_wb=True, output_bps=8)
-                        im = Image.fromarray(rgb)
+                preview = extract_raw_thumbnail(source, half_size=False)
             except Exception as e:
                 print(f"rawpy processing failed: {e}")
                 raise e
 
-            buf = io.BytesIO()
-            im.save(buf, 'JPEG', quality=90)
-            content = buf.getvalue()
+            if isinstance(preview, bytes):
+                content = preview
+            else:
+                buf = io.BytesIO()
+                preview.save(buf, 'JPEG', quality=90)
+                content = buf.getvalue()
             return Response(content=content, media_type='image/jpeg')
         except Exception as e:
             raise HTTPException(500, detail=f"RAW file processing failed: {e}")